@@ -1,5 +1,6 @@
 import streamlit as st
-import json
+import io
+import ijson
 
 def get_seismic_risk_score(lat, lon):
     """
@@ -46,13 +47,20 @@ def calculate_impact_level(magnitude, depth):
     else:
         return "Minor"
 
+import numpy as np
 import pandas as pd
-import requests
+from http_session import SESSION
 import folium
-from folium.plugins import MarkerCluster, HeatMap
-from streamlit_folium import st_folium
+from folium.plugins import FastMarkerCluster, HeatMap
+import streamlit.components.v1 as components
 from datetime import datetime, timedelta
 
+# Simplified Ring of Fire outline (lat, lon), built once at import
+RING_OF_FIRE_SEGMENTS = (
+    ((-55, -70), (-20, -70), (0, -80), (10, -85), (30, -120), (45, -130), (60, -150), (60, -170)),
+    ((55, 170), (40, 140), (0, 110), (-40, 175)),
+)
+
 # === App Config ===
 st.set_page_config(page_title="🌍 Earthquake Tracker", layout="wide")
 st.title("🌍 Real-Time Earthquake Tracker")
@@ -69,61 +77,57 @@ max_mag = st.sidebar.slider("Maximum Magnitude", 0.0, 10.0, 10.0, 0.1)
 min_depth = st.sidebar.slider("Minimum Depth (km)", 0, 700, 0, 10)
 max_depth = st.sidebar.slider("Maximum Depth (km)", 0, 700, 700, 10)
 days = st.sidebar.selectbox("Show Events From (Past Days)", [1, 3, 7, 14, 30], index=2)
-show_volcanoes = st.sidebar.checkbox("🌋 Show Volcanoes", value=True)
-uploaded_geojson = st.sidebar.file_uploader("Upload Volcano GeoJSON", type="geojson")
 
 # === Fetch Earthquake Data from USGS ===
-end_time = datetime.utcnow()
-start_time = end_time - timedelta(days=days)
-url = (
-    "https://earthquake.usgs.gov/fdsnws/event/1/query?"
-    f"format=geojson&starttime={start_time.date()}&endtime={end_time.date()}"
-    f"&minmagnitude={min_mag}&maxmagnitude={max_mag}"
-    f"&mindepth={min_depth}&maxdepth={max_depth}"
-)
-
-response = requests.get(url)
-data = response.json()
-
-if "features" in data:
-    earthquakes = pd.json_normalize(data["features"])
-    earthquakes["time"] = pd.to_datetime(earthquakes["properties.time"], unit='ms')
-    earthquakes = earthquakes.rename(columns={
-        "properties.place": "place",
-        "properties.mag": "magnitude",
-        "geometry.coordinates": "coordinates"
-    })
-    earthquakes["longitude"] = earthquakes["coordinates"].apply(lambda x: x[0])
-    earthquakes["latitude"] = earthquakes["coordinates"].apply(lambda x: x[1])
-    earthquakes["depth"] = earthquakes["coordinates"].apply(lambda x: x[2])
-
-    # Add new columns for seismic risk score and safety tip
-    earthquakes["risk_score"] = earthquakes.apply(lambda row: get_seismic_risk_score(row['latitude'], row['longitude']), axis=1)
-    earthquakes["safety_tip"] = earthquakes["magnitude"].apply(get_educational_tip)
-
-    # === 📆 Disaster Alert Timeline ===
-    earthquakes.set_index("time", inplace=True)
-    daily_counts = earthquakes.resample('D').size()
-    earthquakes.reset_index(inplace=True)
-    st.markdown("### 📆 Disaster Alert Timeline")
-    st.bar_chart(daily_counts)
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_quakes(start_date, end_date, min_mag, max_mag, min_depth, max_depth):
+    """
+    Returns the raw USGS CSV body for the given filters, or None on failure.
+    Cached for 60 seconds so widget reruns don't re-hit the API.
+    """
+    url = (
+        "https://earthquake.usgs.gov/fdsnws/event/1/query?"
+        f"format=csv&starttime={start_date}&endtime={end_date}"
+        f"&minmagnitude={min_mag}&maxmagnitude={max_mag}"
+        f"&mindepth={min_depth}&maxdepth={max_depth}"
+    )
+    response = SESSION.get(url, timeout=30)
+    # 204 means no events matched the filters
+    if response.status_code not in (200, 204):
+        return None
+    return response.content
 
-    # === 🚨 Estimated Impact Level ===
-    earthquakes["impact_level"] = earthquakes.apply(lambda row: calculate_impact_level(row['magnitude'], row['depth']), axis=1)
+@st.cache_data(ttl=60, show_spinner=False)
+def load_quakes(start_date, end_date, min_mag, max_mag, min_depth, max_depth):
+    """
+    Returns a DataFrame of earthquakes for the given filters,
+    or None if the USGS request failed.
+    """
+    body = fetch_quakes(start_date, end_date, min_mag, max_mag, min_depth, max_depth)
+    if body is None:
+        return None
 
-    st.markdown(f"### 📊 {len(earthquakes)} Earthquakes Found")
-    st.dataframe(earthquakes[["time", "place", "magnitude", "depth", "latitude", "longitude", "risk_score", "safety_tip", "impact_level"]])
+    columns = ["time", "latitude", "longitude", "depth", "mag", "place"]
+    if not body.strip():
+        body = ",".join(columns).encode()
+    earthquakes = pd.read_csv(io.BytesIO(body), usecols=columns)
+    earthquakes = earthquakes.rename(columns={"mag": "magnitude"})[
+        ["time", "place", "magnitude", "depth", "latitude", "longitude"]
+    ]
+    earthquakes["time"] = pd.to_datetime(earthquakes["time"], utc=True).dt.tz_localize(None)
 
-    st.markdown("""
-    ### 🌋 What is the Ring of Fire?
-    The Ring of Fire is a horseshoe-shaped area in the Pacific Ocean known for its high seismic activity. 
-    It includes about 75% of the world's active and dormant volcanoes and is the site of frequent earthquakes and volcanic eruptions. 
-    This region is formed by the movement of several tectonic plates.
-    """)
-    
-    # === Earthquake Map with Clustering ===
-    st.markdown("### 🗺️ Earthquake Cluster Map")
+    # 5 decimal places (~1 m) is well beyond what the map can show
+    coord_cols = ["longitude", "latitude", "depth"]
+    earthquakes[coord_cols] = earthquakes[coord_cols].round(5)
+    return earthquakes
 
+# === Map Building ===
+@st.cache_data(ttl=60, show_spinner=False)
+def build_map_html(map_df, heat_data, volcano_data=None):
+    """
+    Returns the rendered HTML of the earthquake map.
+    Cached on the map data so unchanged filters skip rebuilding the map.
+    """
     m = folium.Map(
         location=[10, -150],
         zoom_start=3,
@@ -131,42 +135,96 @@ if "features" in data:
         attr="© OpenStreetMap contributors",
         world_copy_jump=True
     )
-    
+
     # Outline the Ring of Fire using tectonic boundaries along the eastern Pacific rim
-    ring_of_fire_segments = [
-        [[-55, -70], [-40, -70], [-20, -70], [0, -80], [10, -85], [30, -120], [45, -130], [60, -150], [60, -170]],
-        [[55, 170], [40, 140], [0, 110], [-40, 175]]
-    ]
-    for segment in ring_of_fire_segments:
-        folium.PolyLine(segment, color="red", weight=3, tooltip="Ring of Fire").add_to(m)
-
-    marker_cluster = MarkerCluster().add_to(m)
-
-    for _, row in earthquakes.iterrows():
-        popup_text = f"""
-            <b>{row['place']}</b><br>
-            Magnitude: {row['magnitude']}<br>
-            Depth: {row['depth']} km<br>
-            Time: {row['time']}<br>
-            Educational Tip: {row['safety_tip']}<br>
-            Regional Seismic Risk: {row['risk_score']}
+    for segment in RING_OF_FIRE_SEGMENTS:
+        folium.PolyLine(segment, color="red", weight=3, smooth_factor=2.0, tooltip="Ring of Fire").add_to(m)
+
+    # Popup HTML is built column-wise; missing values are stringified first so
+    # one NaN can't blank the whole popup. The markers themselves are created
+    # client-side by the FastMarkerCluster callback
+    popups = (
+        "<b>" + map_df["place"].fillna("Unknown").astype(str) + "</b><br>"
+        + "Magnitude: " + map_df["magnitude"].map(str) + "<br>"
+        + "Depth: " + map_df["depth"].map(str) + " km<br>"
+        + "Time: " + map_df["time"].map(str) + "<br>"
+        + "Educational Tip: " + map_df["safety_tip"].astype(str) + "<br>"
+        + "Regional Seismic Risk: " + map_df["risk_score"].astype(str)
+    )
+    marker_data = map_df[["latitude", "longitude"]].assign(
+        popup=popups, color=map_df["color"], radius=map_df["magnitude"] * 1.5
+    )
+    quake_marker_callback = """
+    function (row) {
+        var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+            radius: row[4],
+            color: row[3],
+            fill: true,
+            fillOpacity: 0.8
+        });
+        marker.bindPopup(row[2], {maxWidth: 300});
+        return marker;
+    };
+    """
+    FastMarkerCluster(marker_data.to_numpy().tolist(), callback=quake_marker_callback).add_to(m)
+
+    # === Volcano Markers ===
+    if volcano_data:
+        volcano_marker_callback = """
+        function (row) {
+            var icon = L.AwesomeMarkers.icon({icon: "fire", prefix: "fa", markerColor: "red"});
+            var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+            marker.bindPopup(row[2]);
+            return marker;
+        };
         """
-        color = "red" if row['magnitude'] >= 6 else "orange" if row['magnitude'] >= 5 else "blue"
+        FastMarkerCluster(volcano_data, callback=volcano_marker_callback).add_to(m)
 
-        folium.CircleMarker(
-            location=[row["latitude"], row["longitude"]],
-            radius=row["magnitude"] * 1.5,
-            color=color,
-            fill=True,
-            fill_opacity=0.8,
-            popup=folium.Popup(popup_text, max_width=300)
-        ).add_to(marker_cluster)
+    # === Community Safety Heatmap ===
+    HeatMap(heat_data).add_to(m)
+
+    return m.get_root().render()
+
+@st.fragment
+def render_map(earthquakes):
+    """
+    Renders the earthquake map and its volcano overlay controls.
+    Runs as a fragment, so toggling the volcano layer or uploading a file
+    reruns only this block rather than the whole app.
+    """
+    st.markdown("### 🗺️ Earthquake Cluster Map")
+    show_volcanoes = st.checkbox("🌋 Show Volcanoes", value=True)
+    uploaded_geojson = st.file_uploader("Upload Volcano GeoJSON", type="geojson")
+
+    # Cap the number of points sent to the browser; keep the strongest events
+    max_map_points = 2000
+    if len(earthquakes) > max_map_points:
+        map_df = earthquakes.nlargest(max_map_points, "magnitude")
+        st.caption(f"Showing the {max_map_points} strongest of {len(earthquakes)} earthquakes on the map.")
+    else:
+        map_df = earthquakes
+
+    # Heatmap over all events; large sets are pre-binned into a 1° grid so the
+    # browser draws one weighted point per non-empty cell instead of every quake
+    if len(earthquakes) < max_map_points:
+        heat_data = earthquakes[["latitude", "longitude"]].to_numpy().tolist()
+    else:
+        counts, lat_edges, lon_edges = np.histogram2d(
+            earthquakes["latitude"].to_numpy(), earthquakes["longitude"].to_numpy(),
+            bins=[180, 360], range=[[-90, 90], [-180, 180]]
+        )
+        rows, cols = np.nonzero(counts)
+        heat_data = np.column_stack([
+            lat_edges[rows] + 0.5, lon_edges[cols] + 0.5, counts[rows, cols] / counts.max()
+        ]).tolist()
 
     # === Volcano Markers ===
+    volcano_data = None
     if show_volcanoes and uploaded_geojson is not None:
         try:
-            volcano_data = json.load(uploaded_geojson)
-            for feature in volcano_data["features"]:
+            # Stream features one at a time instead of loading the whole file
+            volcano_data = []
+            for feature in ijson.items(uploaded_geojson, "features.item", use_float=True):
                 coords = feature["geometry"]["coordinates"]
                 props = feature["properties"]
                 name = props.get("name") or props.get("Volcano_Name", "Unknown")
@@ -174,19 +232,69 @@ if "features" in data:
                 elev = props.get("elevation", props.get("Elevation", "N/A"))
                 eruption = props.get("last_eruption", props.get("Last_Eruption_Year", "Unknown"))
                 popup = f"<b>{name}</b><br>Country: {country}<br>Elevation: {elev} m<br>Last Eruption: {eruption}"
-                folium.Marker(
-                    location=[coords[1], coords[0]],
-                    icon=folium.Icon(color="red", icon="fire", prefix="fa"),
-                    popup=popup
-                ).add_to(m)
+                volcano_data.append([coords[1], coords[0], popup])
         except Exception as e:
+            volcano_data = None
             st.error(f"Failed to load uploaded volcano data: {e}")
 
-    # === Community Safety Heatmap ===
-    heat_data = [[row["latitude"], row["longitude"]] for _, row in earthquakes.iterrows()]
-    HeatMap(heat_data).add_to(m)
+    components.html(build_map_html(map_df, heat_data, volcano_data), width=1000, height=600)
+
+# Keep the classified frame in session state; only reload and reclassify
+# when the filters change or the data is older than the fetch cache TTL
+end_time = datetime.utcnow()
+start_time = end_time - timedelta(days=days)
+filter_key = (start_time.date(), end_time.date(), min_mag, max_mag, min_depth, max_depth)
+if (
+    st.session_state.get("quakes_key") != filter_key
+    or end_time - st.session_state["quakes_fetched_at"] > timedelta(seconds=60)
+):
+    earthquakes = load_quakes(*filter_key)
+
+    if earthquakes is not None:
+        # Add new columns for seismic risk score and safety tip
+        # (vectorized equivalents of get_seismic_risk_score / get_educational_tip)
+        lat = earthquakes["latitude"].to_numpy()
+        mag = earthquakes["magnitude"].to_numpy()
+        earthquakes["risk_score"] = np.select([lat > 50, lat < -50], ["High Risk", "Moderate Risk"], default="Low Risk")
+        earthquakes["safety_tip"] = np.select([mag >= 7, mag >= 5], ["Drop, Cover, and Hold On", "Be Prepared"], default="Stay Alert")
+
+        # Marker color by magnitude band: < 5 blue, 5-6 orange, >= 6 red
+        earthquakes["color"] = np.array(["blue", "orange", "red"])[np.digitize(np.nan_to_num(mag), [5.0, 6.0])]
+
+        # Estimated impact level
+        # (vectorized equivalent of calculate_impact_level)
+        depth = earthquakes["depth"].to_numpy()
+        earthquakes["impact_level"] = np.select([mag >= 7, (mag >= 5) & (depth < 70)], ["Severe", "Moderate"], default="Minor")
 
-    st_folium(m, width=1000, height=600)
+        # Each label column has only three values; store them as categoricals
+        for col in ("risk_score", "safety_tip", "impact_level"):
+            earthquakes[col] = earthquakes[col].astype("category")
+
+        st.session_state["quakes"] = earthquakes
+        st.session_state["quakes_key"] = filter_key
+        st.session_state["quakes_fetched_at"] = end_time
+else:
+    earthquakes = st.session_state["quakes"]
+
+if earthquakes is not None:
+    # === 📆 Disaster Alert Timeline ===
+    # Days without events are filled with 0, as resample('D') would
+    daily_counts = earthquakes["time"].dt.floor("D").value_counts().sort_index().asfreq("D", fill_value=0)
+    st.markdown("### 📆 Disaster Alert Timeline")
+    st.bar_chart(daily_counts)
+
+    st.markdown(f"### 📊 {len(earthquakes)} Earthquakes Found")
+    st.dataframe(earthquakes[["time", "place", "magnitude", "depth", "latitude", "longitude", "risk_score", "safety_tip", "impact_level"]])
+
+    st.markdown("""
+    ### 🌋 What is the Ring of Fire?
+    The Ring of Fire is a horseshoe-shaped area in the Pacific Ocean known for its high seismic activity. 
+    It includes about 75% of the world's active and dormant volcanoes and is the site of frequent earthquakes and volcanic eruptions. 
+    This region is formed by the movement of several tectonic plates.
+    """)
+    
+    # === Earthquake Map with Clustering ===
+    render_map(earthquakes)
 
 else:
-    st.error("❌ Failed to retrieve earthquake data from USGS.")
\ No newline at end of file
+    st.error("❌ Failed to retrieve earthquake data from USGS.")
@@ -1,26 +1,46 @@
-import requests
-import json
+import gzip
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+
+from http_session import SESSION
 
 BASE_URL = "https://www.ngdc.noaa.gov/hazel/hazard-service/api/v1/volcanoes"
-all_volcanoes = []
+MAX_WORKERS = 16
 
-page = 1
-while True:
+def fetch_page(page):
     print(f"Fetching page {page}...")
-    response = requests.get(BASE_URL, params={"page": page})
+    response = SESSION.get(BASE_URL, params={"page": page}, timeout=30)
     if response.status_code != 200:
         print(f"Failed at page {page} with status code: {response.status_code}")
-        break
+        return None
+    return orjson.loads(response.content)
+
+# The first page tells us how many pages there are; fetch the rest in parallel
+first = fetch_page(1)
+if first is None:
+    sys.exit(1)
+
+all_volcanoes = list(first.get("items", []))
+total_pages = first.get("totalPages", 1)
+failed_pages = []
 
-    data = response.json()
-    all_volcanoes.extend(data.get("items", []))
+with ThreadPoolExecutor(MAX_WORKERS) as executor:
+    pages = range(2, total_pages + 1)
+    for page, data in zip(pages, executor.map(fetch_page, pages)):
+        if data is None:
+            failed_pages.append(page)
+        else:
+            all_volcanoes.extend(data.get("items", []))
 
-    if page >= data.get("totalPages", 1):
-        break
-    page += 1
+# Don't overwrite the previous dataset with an incomplete crawl
+if failed_pages:
+    print(f"Not saving: {len(failed_pages)} of {total_pages} pages failed: {failed_pages}")
+    sys.exit(1)
 
 # Save the complete dataset to a file
-with open("noaa_volcanoes.json", "w") as f:
-    json.dump(all_volcanoes, f, indent=2)
+with gzip.open("noaa_volcanoes.json.gz", "wb") as f:
+    f.write(orjson.dumps(all_volcanoes))
 
-print(f"Saved {len(all_volcanoes)} volcanoes to noaa_volcanoes.json")
\ No newline at end of file
+print(f"Saved {len(all_volcanoes)} volcanoes to noaa_volcanoes.json.gz")